@@ -1,52 +1,144 @@
 #!/usr/bin/env python3
 
+import ctypes
+import json
 import subprocess
 import sys
 import os
 import argparse
+import tempfile
+import threading
 import time
 
+# Sentinel printed after every command so the reader knows where output ends
+PS_SENTINEL = "___END___"
+
+# Boot order snippet (DVD first, then hard disk), built once at import and
+# only formatted with the VM name at the call site
+BOOT_ORDER_CMD = (
+    '$dvd = Get-VMDvdDrive -VMName "{vm_name}"; '
+    '$hdd = Get-VMHardDiskDrive -VMName "{vm_name}"; '
+    'Set-VMFirmware -VMName "{vm_name}" -BootOrder $dvd,$hdd'
+)
+
+_ps_proc = None
+_ps_stderr = []
+_ps_lock = threading.Lock()
+
+def _drain_stderr(pipe, sink):
+    """Collect stderr lines from the shared PowerShell process"""
+    for line in pipe:
+        sink.append(line)
+
+def _get_ps_session():
+    """Return the shared long-lived PowerShell process, starting it if needed"""
+    global _ps_proc
+    if _ps_proc is None or _ps_proc.poll() is not None:
+        _ps_proc = subprocess.Popen(
+            ['powershell', '-NoProfile', '-NoLogo', '-NonInteractive', '-Command', '-'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True
+        )
+        del _ps_stderr[:]
+        threading.Thread(
+            target=_drain_stderr,
+            args=(_ps_proc.stderr, _ps_stderr),
+            daemon=True
+        ).start()
+    return _ps_proc
+
 def run_command(cmd, check=True):
-    """Execute PowerShell command and return result"""
-    try:
-        if isinstance(cmd, list):
-            cmd_str = ' '.join(cmd)
-        else:
-            cmd_str = cmd
-
-        result = subprocess.run(
-            ['powershell', '-Command', cmd_str],
-            capture_output=True,
-            text=True,
-            check=check
+    """Execute PowerShell command in the shared session and return result"""
+    if isinstance(cmd, list):
+        cmd_str = ' '.join(cmd)
+    else:
+        cmd_str = cmd
+
+    with _ps_lock:
+        proc = _get_ps_session()
+        del _ps_stderr[:]
+        proc.stdin.write(
+            f"{cmd_str}\nWrite-Host '{PS_SENTINEL}'$(if ($?) {{0}} else {{1}})\n"
         )
-        return result.returncode == 0, result.stdout, result.stderr
-    except subprocess.CalledProcessError as e:
-        return False, e.stdout, e.stderr
+        proc.stdin.flush()
+
+        out_lines = []
+        exit_code = 1
+        for line in iter(proc.stdout.readline, ''):
+            if line.startswith(PS_SENTINEL):
+                code = line[len(PS_SENTINEL):].strip()
+                exit_code = int(code) if code.isdigit() else 1
+                break
+            out_lines.append(line)
+
+        return exit_code == 0, ''.join(out_lines), ''.join(_ps_stderr)
+
+def run_ps_batch(commands, check=True):
+    """Execute a list of PowerShell statements in one round trip"""
+    return run_command('\n'.join(commands), check=check)
 
 def check_admin():
     """Check if script is running as administrator"""
     print("[1/6] Checking administrator privileges...")
-    success, stdout, _ = run_command(
-        "([Security.Principal.WindowsPrincipal][Security.Principal.WindowsIdentity]::GetCurrent()).IsInRole([Security.Principal.WindowsBuiltInRole]::Administrator)"
-    )
+    try:
+        is_admin = bool(ctypes.windll.shell32.IsUserAnAdmin())
+    except AttributeError:
+        # Not on Windows; Hyper-V commands would fail anyway
+        is_admin = False
 
-    if not success or "False" in stdout:
+    if not is_admin:
         print("ERROR: This script must be run as Administrator")
         print("Right-click PowerShell or Command Prompt and select 'Run as Administrator'")
         sys.exit(1)
 
     print("Running with administrator privileges")
 
-def check_hyperv():
+# Feature probes go through Get-WindowsOptionalFeature, which takes several
+# seconds per call; results are kept in a small on-disk cache so a rerun
+# within the TTL (say, after fixing a bad argument) skips the probe.
+# --force-check bypasses the cache
+PROBE_CACHE_PATH = os.path.join(tempfile.gettempdir(), 'install_ubuntu_hyperv_probes.json')
+PROBE_CACHE_TTL = 300  # seconds
+
+def read_probe_cache():
+    """Return the cached probe results, or {} if missing, stale or unreadable"""
+    try:
+        with open(PROBE_CACHE_PATH) as f:
+            cache = json.load(f)
+        if time.time() - cache['timestamp'] <= PROBE_CACHE_TTL:
+            return cache['probes']
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return {}
+
+def write_probe_cache(probes):
+    """Persist probe results; caching is best-effort, so failures are ignored"""
+    try:
+        with open(PROBE_CACHE_PATH, 'w') as f:
+            json.dump({'timestamp': time.time(), 'probes': probes}, f)
+    except OSError:
+        pass
+
+def get_feature_state(feature_name, force=False):
+    """Return a Windows optional feature's state, cached on disk between runs"""
+    probes = read_probe_cache()
+    if force or feature_name not in probes:
+        success, stdout, _ = run_command(
+            f"Get-WindowsOptionalFeature -Online -FeatureName {feature_name} | Select-Object -ExpandProperty State",
+            check=False
+        )
+        probes[feature_name] = stdout.strip() if success else ""
+        write_probe_cache(probes)
+    return probes[feature_name]
+
+def check_hyperv(force=False):
     """Check if Hyper-V is enabled"""
     print("\n[2/6] Checking Hyper-V status...")
-    success, stdout, _ = run_command(
-        "Get-WindowsOptionalFeature -Online -FeatureName Microsoft-Hyper-V-All | Select-Object -ExpandProperty State",
-        check=False
-    )
+    state = get_feature_state("Microsoft-Hyper-V-All", force=force)
 
-    if not success or "Enabled" not in stdout:
+    if "Enabled" not in state:
         print("Hyper-V is not enabled. Enabling Hyper-V...")
         print("This will require a system restart.")
 
@@ -56,6 +148,8 @@ def check_hyperv():
             sys.exit(1)
 
         run_command("Enable-WindowsOptionalFeature -Online -FeatureName Microsoft-Hyper-V-All -NoRestart")
+        # The cached state is stale now that the feature was just enabled
+        write_probe_cache({})
         print("\nHyper-V has been enabled.")
         print("Please restart your computer and run this script again.")
         sys.exit(0)
@@ -66,8 +160,18 @@ def download_ubuntu_iso(iso_path):
     """Check Ubuntu ISO"""
     print("\n[3/6] Checking Ubuntu ISO...")
 
-    if os.path.exists(iso_path):
-        print(f"ISO found: {iso_path}")
+    # One stat call gives existence and size together
+    try:
+        iso_size = os.stat(iso_path).st_size
+    except OSError:
+        iso_size = None
+
+    if iso_size is not None:
+        if iso_size == 0:
+            print(f"ERROR: ISO exists but is empty (truncated download?): {iso_path}")
+            print("Delete the file and download Ubuntu 24.04 again.")
+            sys.exit(1)
+        print(f"ISO found: {iso_path} ({iso_size // (1024 * 1024)}MB)")
         return os.path.abspath(iso_path)
 
     print("Ubuntu 24.04 ISO not found.")
@@ -78,96 +182,70 @@ def download_ubuntu_iso(iso_path):
     sys.exit(1)
 
 def create_vm(vm_name, memory_gb, cpu_count, disk_size_gb, vm_path):
-    """Create Hyper-V VM"""
-    print(f"\n[4/6] Creating VM: {vm_name}...")
-
-    # Check if VM exists
-    success, stdout, _ = run_command(f'Get-VM -Name "{vm_name}"', check=False)
-    if success and vm_name in stdout:
-        print(f"VM '{vm_name}' already exists. Removing it...")
-        run_command(f'Stop-VM -Name "{vm_name}" -Force -TurnOff', check=False)
-        time.sleep(2)
-        run_command(f'Remove-VM -Name "{vm_name}" -Force', check=False)
-        time.sleep(2)
-
-    # Create VM directory
-    vm_dir = os.path.join(vm_path, vm_name)
-    os.makedirs(vm_dir, exist_ok=True)
+    """Queue Hyper-V VM creation commands"""
+    print(f"\n[4/6] Preparing VM: {vm_name}...")
+    print(f"VM will have {memory_gb}GB RAM, {cpu_count} CPUs")
+    print(f"Any existing VM named '{vm_name}' will be replaced.")
 
-    # Create new VM
     memory_bytes = memory_gb * 1024 * 1024 * 1024
-    cmd = f'New-VM -Name "{vm_name}" -MemoryStartupBytes {memory_bytes} -Generation 2 -Path "{vm_path}"'
-    run_command(cmd)
-
-    # Configure VM
-    run_command(f'Set-VM -Name "{vm_name}" -ProcessorCount {cpu_count} -AutomaticStartAction Start -AutomaticStartDelay 10')
-    run_command(f'Set-VM -Name "{vm_name}" -CheckpointType Disabled')
-
-    # Enable nested virtualization (optional, for running containers)
-    run_command(f'Set-VMProcessor -VMName "{vm_name}" -ExposeVirtualizationExtensions $true', check=False)
-
-    print(f"VM created with {memory_gb}GB RAM, {cpu_count} CPUs")
+    return [
+        # Remove a leftover VM of the same name; the shutdown is polled
+        # instead of slept through
+        f'$vm = Get-VM -Name "{vm_name}" -ErrorAction SilentlyContinue',
+        f'if ($vm) {{ Stop-VM -Name "{vm_name}" -Force -TurnOff -Confirm:$false -ErrorAction SilentlyContinue }}',
+        f'if ($vm) {{ $t = [datetime]::Now; while ((Get-VM -Name "{vm_name}" -ErrorAction SilentlyContinue).State -ne \'Off\' -and ([datetime]::Now - $t).TotalSeconds -lt 10) {{ Start-Sleep -Milliseconds 100 }} }}',
+        f'if ($vm) {{ Remove-VM -Name "{vm_name}" -Force -Confirm:$false }}',
+        # Create and configure VM; New-VM creates the VM directory itself,
+        # and create_storage makes the disk directory it needs
+        f'New-VM -Name "{vm_name}" -MemoryStartupBytes {memory_bytes} -Generation 2 -Path "{vm_path}"',
+        f'Set-VM -Name "{vm_name}" -ProcessorCount {cpu_count} -AutomaticStartAction Start -AutomaticStartDelay 10 -CheckpointType Disabled',
+        # Enable nested virtualization (optional, for running containers)
+        f'Set-VMProcessor -VMName "{vm_name}" -ExposeVirtualizationExtensions $true -ErrorAction SilentlyContinue',
+    ]
 
 def create_storage(vm_name, disk_size_gb, iso_path, vm_path):
-    """Create and attach virtual disk and ISO"""
-    print(f"\n[5/6] Creating storage...")
+    """Queue virtual disk and ISO attachment commands"""
+    print(f"\n[5/6] Preparing storage...")
 
-    # Create virtual hard disk
     vm_dir = os.path.join(vm_path, vm_name)
     vhdx_path = os.path.join(vm_dir, "Virtual Hard Disks", f"{vm_name}.vhdx")
 
     os.makedirs(os.path.dirname(vhdx_path), exist_ok=True)
 
-    disk_size_bytes = disk_size_gb * 1024 * 1024 * 1024
-    cmd = f'New-VHD -Path "{vhdx_path}" -SizeBytes {disk_size_bytes} -Dynamic'
-    run_command(cmd)
+    print(f"Disk: {disk_size_gb}GB at {vhdx_path}")
+    print(f"ISO: {iso_path}")
 
-    # Add SCSI controller and attach disk
-    run_command(f'Add-VMScsiController -VMName "{vm_name}"', check=False)
-    run_command(f'Add-VMHardDiskDrive -VMName "{vm_name}" -Path "{vhdx_path}"')
-
-    # Add DVD drive and attach ISO
-    run_command(f'Add-VMDvdDrive -VMName "{vm_name}" -Path "{iso_path}"')
-
-    # Set boot order (DVD first, then hard disk)
-    run_command(f'$dvd = Get-VMDvdDrive -VMName "{vm_name}"; $hdd = Get-VMHardDiskDrive -VMName "{vm_name}"; Set-VMFirmware -VMName "{vm_name}" -BootOrder $dvd,$hdd')
-
-    # Disable Secure Boot (Ubuntu may need this)
-    run_command(f'Set-VMFirmware -VMName "{vm_name}" -EnableSecureBoot Off')
-
-    print(f"Storage created: {disk_size_gb}GB disk")
-    print(f"ISO attached: {iso_path}")
+    disk_size_bytes = disk_size_gb * 1024 * 1024 * 1024
+    return [
+        f'New-VHD -Path "{vhdx_path}" -SizeBytes {disk_size_bytes} -Dynamic',
+        # Add SCSI controller and attach disk
+        f'Add-VMScsiController -VMName "{vm_name}" -ErrorAction SilentlyContinue',
+        f'Add-VMHardDiskDrive -VMName "{vm_name}" -Path "{vhdx_path}"',
+        # Add DVD drive and attach ISO
+        f'Add-VMDvdDrive -VMName "{vm_name}" -Path "{iso_path}"',
+        # Set boot order (DVD first, then hard disk)
+        BOOT_ORDER_CMD.format(vm_name=vm_name),
+        # Disable Secure Boot (Ubuntu may need this)
+        f'Set-VMFirmware -VMName "{vm_name}" -EnableSecureBoot Off',
+    ]
 
 def create_network_switch(vm_name, switch_name):
-    """Create or use existing virtual switch"""
-    print(f"\n[6/6] Configuring network...")
-
-    # Check if switch exists
-    success, stdout, _ = run_command(f'Get-VMSwitch -Name "{switch_name}"', check=False)
-
-    if not success or switch_name not in stdout:
-        print(f"Creating external virtual switch: {switch_name}...")
-        print("This will use your default network adapter.")
-
-        # Get default network adapter
-        success, stdout, _ = run_command(
-            "Get-NetAdapter | Where-Object {$_.Status -eq 'Up'} | Select-Object -First 1 -ExpandProperty Name"
-        )
-
-        if success and stdout.strip():
-            adapter_name = stdout.strip()
-            cmd = f'New-VMSwitch -Name "{switch_name}" -NetAdapterName "{adapter_name}" -AllowManagementOS $true'
-            run_command(cmd, check=False)
-            print(f"Virtual switch created using adapter: {adapter_name}")
-        else:
-            print("WARNING: Could not create external switch. Creating internal switch instead.")
-            run_command(f'New-VMSwitch -Name "{switch_name}" -SwitchType Internal')
-    else:
-        print(f"Using existing virtual switch: {switch_name}")
-
-    # Connect VM to switch
-    run_command(f'Add-VMNetworkAdapter -VMName "{vm_name}" -SwitchName "{switch_name}"')
-    print(f"VM connected to network switch")
+    """Queue virtual switch creation and attachment commands"""
+    print(f"\n[6/6] Preparing network...")
+
+    # Create the switch if missing; the existence check, adapter lookup and
+    # creation all run in the same invocation, falling back to an internal
+    # switch when no adapter is up
+    print(f"Virtual switch '{switch_name}' will be created if it does not exist.")
+    print("An external switch will use your default network adapter.")
+    return [
+        f'$sw = Get-VMSwitch -Name "{switch_name}" -ErrorAction SilentlyContinue',
+        "$adapter = Get-NetAdapter -Physical | Where-Object Status -eq 'Up' | Select-Object -First 1 -ExpandProperty Name",
+        f'if (-not $sw -and $adapter) {{ New-VMSwitch -Name "{switch_name}" -NetAdapterName "$adapter" -AllowManagementOS $true }}',
+        f'if (-not $sw -and -not $adapter) {{ New-VMSwitch -Name "{switch_name}" -SwitchType Internal }}',
+        # Connect VM to switch
+        f'Add-VMNetworkAdapter -VMName "{vm_name}" -SwitchName "{switch_name}"',
+    ]
 
 def start_vm(vm_name):
     """Start the VM"""
@@ -179,46 +257,58 @@ def start_vm(vm_name):
     print("Opening VM console...")
     run_command(f'vmconnect localhost "{vm_name}"', check=False)
 
-def print_summary(vm_name, memory_gb, cpu_count, disk_size_gb, switch_name, iso_path):
-    """Print installation summary"""
-    print("\n" + "="*50)
-    print("VM Creation Complete!")
-    print("="*50)
+# Built once at import; print_summary only fills in the values
+SUMMARY_TEMPLATE = """
+{bar}
+VM Creation Complete!
+{bar}
 
-    print(f"\nVM Name: {vm_name}")
-    print(f"\nResources:")
-    print(f"  - RAM: {memory_gb}GB")
-    print(f"  - CPUs: {cpu_count}")
-    print(f"  - Disk: {disk_size_gb}GB")
+VM Name: {vm_name}
 
-    print(f"\nNetwork:")
-    print(f"  - Virtual Switch: {switch_name}")
+Resources:
+  - RAM: {memory_gb}GB
+  - CPUs: {cpu_count}
+  - Disk: {disk_size_gb}GB
 
-    print(f"\nISO: {iso_path}")
+Network:
+  - Virtual Switch: {switch_name}
 
-    print(f"\nAutostart:")
-    print(f"  - VM will automatically start on host boot")
-    print(f"  - Autostart delay: 10 seconds")
+ISO: {iso_path}
 
-    print(f"\nInstallation:")
-    print(f"  - Follow the Ubuntu installer in the VM console")
-    print(f"  - After installation, remove the ISO:")
-    print(f'    Get-VMDvdDrive -VMName "{vm_name}" | Remove-VMDvdDrive')
+Autostart:
+  - VM will automatically start on host boot
+  - Autostart delay: 10 seconds
 
-    print(f"\nUseful PowerShell Commands:")
-    print(f'  Get-VM -Name "{vm_name}"                    # Show VM info')
-    print(f'  Start-VM -Name "{vm_name}"                  # Start VM')
-    print(f'  Stop-VM -Name "{vm_name}"                   # Shutdown VM')
-    print(f'  Stop-VM -Name "{vm_name}" -Force            # Force shutdown')
-    print(f'  vmconnect localhost "{vm_name}"             # Open console')
-    print(f'  Get-VMNetworkAdapter -VMName "{vm_name}"    # Show network info')
-    print(f'  Remove-VM -Name "{vm_name}" -Force          # Delete VM')
+Installation:
+  - Follow the Ubuntu installer in the VM console
+  - After installation, remove the ISO:
+    Get-VMDvdDrive -VMName "{vm_name}" | Remove-VMDvdDrive
 
-    print(f"\nAfter Ubuntu Installation:")
-    print(f"  - Install SSH server in Ubuntu: sudo apt install openssh-server")
-    print(f"  - Configure port forwarding or use bridged network for access")
+Useful PowerShell Commands:
+  Get-VM -Name "{vm_name}"                    # Show VM info
+  Start-VM -Name "{vm_name}"                  # Start VM
+  Stop-VM -Name "{vm_name}"                   # Shutdown VM
+  Stop-VM -Name "{vm_name}" -Force            # Force shutdown
+  vmconnect localhost "{vm_name}"             # Open console
+  Get-VMNetworkAdapter -VMName "{vm_name}"    # Show network info
+  Remove-VM -Name "{vm_name}" -Force          # Delete VM
 
-    print("="*50)
+After Ubuntu Installation:
+  - Install SSH server in Ubuntu: sudo apt install openssh-server
+  - Configure port forwarding or use bridged network for access
+{bar}"""
+
+def print_summary(vm_name, memory_gb, cpu_count, disk_size_gb, switch_name, iso_path):
+    """Print installation summary"""
+    print(SUMMARY_TEMPLATE.format(
+        bar="=" * 50,
+        vm_name=vm_name,
+        memory_gb=memory_gb,
+        cpu_count=cpu_count,
+        disk_size_gb=disk_size_gb,
+        switch_name=switch_name,
+        iso_path=iso_path,
+    ))
 
 def main():
     parser = argparse.ArgumentParser(description='Create Ubuntu 24.04 VM in Hyper-V')
@@ -238,6 +328,8 @@ def main():
                       help='Virtual switch name (default: External-Switch)')
     parser.add_argument('--no-start', action='store_true',
                       help='Do not start VM after creation')
+    parser.add_argument('--force-check', action='store_true',
+                      help='Re-run environment checks, ignoring cached results')
 
     args = parser.parse_args()
 
@@ -248,19 +340,20 @@ def main():
 
     # Check prerequisites
     check_admin()
-    check_hyperv()
+    check_hyperv(force=args.force_check)
 
     # Check ISO
     iso_path = download_ubuntu_iso(args.iso_path)
 
-    # Create VM
-    create_vm(args.vm_name, args.memory, args.cpus, args.disk_size, args.vm_path)
-
-    # Create storage
-    create_storage(args.vm_name, args.disk_size, iso_path, args.vm_path)
+    # Queue the whole creation sequence and run it in a single pass
+    ps_script = []
+    ps_script += create_vm(args.vm_name, args.memory, args.cpus, args.disk_size, args.vm_path)
+    ps_script += create_storage(args.vm_name, args.disk_size, iso_path, args.vm_path)
+    ps_script += create_network_switch(args.vm_name, args.switch_name)
 
-    # Configure network
-    create_network_switch(args.vm_name, args.switch_name)
+    print("\nApplying VM, storage and network configuration...")
+    run_ps_batch(ps_script, check=False)
+    print("VM configured")
 
     # Start VM
     if not args.no_start:
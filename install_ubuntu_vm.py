@@ -1,48 +1,188 @@
 #!/usr/bin/env python3
 
+import asyncio
+import json
 import subprocess
 import sys
 import os
 import argparse
+import tempfile
 import time
+import urllib.error
 import urllib.request
 
-def run_command(cmd, check=True):
-    """Execute shell command and return result"""
+UBUNTU_ISO_URL = "https://releases.ubuntu.com/24.04/ubuntu-24.04.2-live-server-amd64.iso"
+
+# NAT port forwards (name, host port, guest port); all rules are applied in
+# the single modifyvm call in create_vm
+PORT_FORWARDS = [
+    ('ssh', 2222, 22),
+    ('http', 8000, 80),
+    ('https', 8443, 443),
+    ('phpmyadmin', 8080, 8080),
+]
+
+def run_command(cmd, check=True, capture=True):
+    """Execute command (argv list) and return result
+
+    capture=False lets the command write straight to the terminal, for
+    callers that never look at the output.
+    """
     try:
-        if isinstance(cmd, list):
-            result = subprocess.run(cmd, capture_output=True, text=True, check=check)
-        else:
-            result = subprocess.run(cmd, capture_output=True, text=True, shell=True, check=check)
-        return result.returncode == 0, result.stdout, result.stderr
+        if isinstance(cmd, str):
+            cmd = cmd.split()
+        result = subprocess.run(cmd, capture_output=capture, text=True, check=check)
+        return result.returncode == 0, result.stdout or '', result.stderr or ''
     except subprocess.CalledProcessError as e:
-        return False, e.stdout, e.stderr
-
-def check_vboxmanage():
+        return False, e.stdout or '', e.stderr or ''
+
+def run_commands_parallel(cmds, progress=False):
+    """Run independent commands concurrently and wait for all to finish
+
+    With progress=True a dot is printed every half second while commands
+    are still running, so long operations don't look hung.
+    """
+    async def _run(cmd):
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        stdout, stderr = await proc.communicate()
+        return proc.returncode == 0, stdout.decode(), stderr.decode()
+
+    async def _gather():
+        tasks = [asyncio.ensure_future(_run(cmd)) for cmd in cmds]
+        if progress:
+            while not all(task.done() for task in tasks):
+                print('.', end='', flush=True)
+                await asyncio.sleep(0.5)
+            print()
+        return await asyncio.gather(*tasks)
+
+    return asyncio.run(_gather())
+
+def parse_vminfo(stdout):
+    """Parse `showvminfo --machinereadable` output into a key/value dict"""
+    info = {}
+    for line in stdout.splitlines():
+        key, sep, value = line.partition('=')
+        if sep:
+            info[key] = value.strip('"')
+    return info
+
+# Environment probes are cached on disk so repeated runs (e.g. retrying after
+# a failed download) skip the probe commands; entries older than the TTL are
+# ignored, and --force-check bypasses the cache entirely
+PROBE_CACHE_PATH = os.path.join(tempfile.gettempdir(), 'install_ubuntu_vm_probes.json')
+PROBE_CACHE_TTL = 300  # seconds
+
+def read_probe_cache():
+    """Return the cached probe results, or {} if missing, stale or unreadable"""
+    try:
+        with open(PROBE_CACHE_PATH) as f:
+            cache = json.load(f)
+        if time.time() - cache['timestamp'] <= PROBE_CACHE_TTL:
+            return cache['probes']
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return {}
+
+def write_probe_cache(probes):
+    """Persist probe results; caching is best-effort, so failures are ignored"""
+    try:
+        with open(PROBE_CACHE_PATH, 'w') as f:
+            json.dump({'timestamp': time.time(), 'probes': probes}, f)
+    except OSError:
+        pass
+
+def get_vbox_version(force=False):
+    """Return `VBoxManage --version` output, cached on disk between runs"""
+    probes = read_probe_cache()
+    if force or 'vbox_version' not in probes:
+        success, stdout, _ = run_command(['VBoxManage', '--version'], check=False)
+        probes['vbox_version'] = stdout.strip() if success else ""
+        write_probe_cache(probes)
+    return probes['vbox_version']
+
+def check_vboxmanage(force=False):
     """Check if VBoxManage is installed and in PATH"""
     print("[1/7] Checking VirtualBox installation...")
-    success, stdout, stderr = run_command("VBoxManage --version", check=False)
+    version = get_vbox_version(force=force)
 
-    if not success:
+    if not version:
         print("ERROR: VBoxManage not found in PATH")
         print("Please install VirtualBox from: https://www.virtualbox.org/wiki/Downloads")
         print("\nOn Windows, ensure VirtualBox installation directory is in PATH:")
         print("  Typically: C:\\Program Files\\Oracle\\VirtualBox")
         sys.exit(1)
 
-    version = stdout.strip()
     print(f"VirtualBox found: {version}")
     return True
 
+def download_iso_with_resume(url, iso_path):
+    """Download the ISO to a .part file, resuming any partial download
+
+    An interrupted run leaves the .part file behind; the next run sends an
+    HTTP Range header so only the missing bytes are fetched.
+    """
+    part_path = iso_path + '.part'
+    try:
+        downloaded = os.stat(part_path).st_size
+    except OSError:
+        downloaded = 0
+
+    request = urllib.request.Request(url)
+    if downloaded:
+        print(f"Resuming download at {downloaded // (1024 * 1024)}MB...")
+        request.add_header('Range', f'bytes={downloaded}-')
+
+    with urllib.request.urlopen(request) as response:
+        # A server that ignores Range replies 200 with the full body
+        if downloaded and response.status != 206:
+            downloaded = 0
+        total = downloaded + int(response.headers.get('Content-Length', 0))
+        with open(part_path, 'ab' if downloaded else 'wb') as f:
+            while True:
+                chunk = response.read(1024 * 1024)
+                if not chunk:
+                    break
+                f.write(chunk)
+                downloaded += len(chunk)
+                if total:
+                    print(f"\rDownloading: {downloaded * 100 // total}%", end='', flush=True)
+    print()
+    os.replace(part_path, iso_path)
+
 def download_ubuntu_iso(iso_path):
     """Download Ubuntu 24.04 ISO if not present"""
     print("\n[2/7] Checking Ubuntu ISO...")
 
-    if os.path.exists(iso_path):
-        print(f"ISO already exists: {iso_path}")
+    # One stat call gives existence and size together
+    try:
+        iso_size = os.stat(iso_path).st_size
+    except OSError:
+        iso_size = None
+
+    if iso_size is not None:
+        if iso_size == 0:
+            print(f"ERROR: ISO exists but is empty (truncated download?): {iso_path}")
+            print("Delete the file and download Ubuntu 24.04 again.")
+            sys.exit(1)
+        print(f"ISO already exists: {iso_path} ({iso_size // (1024 * 1024)}MB)")
         return iso_path
 
     print("Ubuntu 24.04 ISO not found.")
+    response = input(f"Download it now from {UBUNTU_ISO_URL}? (yes/no): ")
+    if response.lower() in ['yes', 'y']:
+        try:
+            download_iso_with_resume(UBUNTU_ISO_URL, iso_path)
+            print(f"ISO downloaded: {iso_path}")
+            return iso_path
+        except (urllib.error.URLError, OSError) as e:
+            print(f"Download failed: {e}")
+            print("The partial download is kept and will resume on the next run.")
+
     print("\nPlease download Ubuntu 24.04 ISO manually from:")
     print("  https://ubuntu.com/download/server")
     print("  https://releases.ubuntu.com/24.04/")
@@ -54,10 +194,10 @@ def create_vm(vm_name, memory_mb, cpu_count, disk_size_mb):
     print(f"\n[3/7] Creating VM: {vm_name}...")
 
     # Delete existing VM if it exists
-    success, _, _ = run_command(f'VBoxManage showvminfo "{vm_name}"', check=False)
+    success, _, _ = run_command(['VBoxManage', 'showvminfo', vm_name], check=False)
     if success:
         print(f"VM '{vm_name}' already exists. Removing it...")
-        run_command(f'VBoxManage unregistervm "{vm_name}" --delete', check=False)
+        run_command(['VBoxManage', 'unregistervm', vm_name, '--delete'], check=False)
         time.sleep(2)
 
     # Create VM
@@ -68,8 +208,8 @@ def create_vm(vm_name, memory_mb, cpu_count, disk_size_mb):
         '--register'
     ])
 
-    # Configure VM
-    run_command([
+    # Configure VM; all port-forward rules ride along in the same call
+    cmd = [
         'VBoxManage', 'modifyvm', vm_name,
         '--memory', str(memory_mb),
         '--cpus', str(cpu_count),
@@ -79,12 +219,11 @@ def create_vm(vm_name, memory_mb, cpu_count, disk_size_mb):
         '--boot3', 'none',
         '--boot4', 'none',
         '--audio', 'none',
-        '--nic1', 'nat',
-        '--natpf1', 'ssh,tcp,,2222,,22',
-        '--natpf1', 'http,tcp,,8000,,80',
-        '--natpf1', 'https,tcp,,8443,,443',
-        '--natpf1', 'phpmyadmin,tcp,,8080,,8080'
-    ])
+        '--nic1', 'nat'
+    ]
+    for name, host_port, guest_port in PORT_FORWARDS:
+        cmd += ['--natpf1', f'{name},tcp,,{host_port},,{guest_port}']
+    run_command(cmd)
 
     print(f"VM created with {memory_mb}MB RAM, {cpu_count} CPUs")
 
@@ -93,13 +232,9 @@ def create_storage(vm_name, disk_size_mb, iso_path):
     print(f"\n[4/7] Creating storage...")
 
     # Get VM folder
-    success, stdout, _ = run_command(f'VBoxManage showvminfo "{vm_name}" --machinereadable')
-    vm_folder = None
-    for line in stdout.split('\n'):
-        if 'CfgFile=' in line:
-            cfg_path = line.split('=')[1].strip('"')
-            vm_folder = os.path.dirname(cfg_path)
-            break
+    success, stdout, _ = run_command(['VBoxManage', 'showvminfo', vm_name, '--machinereadable'])
+    cfg_path = parse_vminfo(stdout).get('CfgFile')
+    vm_folder = os.path.dirname(cfg_path) if cfg_path else None
 
     if not vm_folder:
         print("ERROR: Could not determine VM folder")
@@ -107,23 +242,25 @@ def create_storage(vm_name, disk_size_mb, iso_path):
 
     vdi_path = os.path.join(vm_folder, f"{vm_name}.vdi")
 
-    # Create storage controller
-    run_command([
-        'VBoxManage', 'storagectl', vm_name,
-        '--name', 'SATA',
-        '--add', 'sata',
-        '--controller', 'IntelAhci',
-        '--portcount', '2',
-        '--bootable', 'on'
-    ])
-
-    # Create virtual hard disk
-    run_command([
-        'VBoxManage', 'createmedium', 'disk',
-        '--filename', vdi_path,
-        '--size', str(disk_size_mb),
-        '--format', 'VDI'
-    ])
+    # Create the storage controller and the virtual hard disk in parallel;
+    # neither depends on the other, only the attach steps below need both
+    print(f"Allocating {disk_size_mb}MB disk", end='', flush=True)
+    run_commands_parallel([
+        [
+            'VBoxManage', 'storagectl', vm_name,
+            '--name', 'SATA',
+            '--add', 'sata',
+            '--controller', 'IntelAhci',
+            '--portcount', '2',
+            '--bootable', 'on'
+        ],
+        [
+            'VBoxManage', 'createmedium', 'disk',
+            '--filename', vdi_path,
+            '--size', str(disk_size_mb),
+            '--format', 'VDI'
+        ],
+    ], progress=True)
 
     # Attach hard disk
     run_command([
@@ -178,8 +315,11 @@ def enable_autostart(vm_name):
     """Enable VM autostart on host boot"""
     print(f"\n[6/7] Enabling autostart on host boot...")
 
-    run_command(['VBoxManage', 'modifyvm', vm_name, '--autostart-enabled', 'on'])
-    run_command(['VBoxManage', 'modifyvm', vm_name, '--autostart-delay', '10'])
+    run_command([
+        'VBoxManage', 'modifyvm', vm_name,
+        '--autostart-enabled', 'on',
+        '--autostart-delay', '10'
+    ])
 
     print(f"VM autostart enabled (10 second delay)")
 
@@ -188,62 +328,78 @@ def start_vm(vm_name, headless=False):
     print(f"\n[7/7] Starting VM...")
 
     vm_type = 'headless' if headless else 'gui'
-    run_command(['VBoxManage', 'startvm', vm_name, '--type', vm_type])
+    run_command(['VBoxManage', 'startvm', vm_name, '--type', vm_type], capture=False)
 
     if headless:
         print(f"VM started in headless mode")
     else:
         print(f"VM started with GUI")
 
+# Built once at import; print_summary only fills in the values
+SUMMARY_TEMPLATE = """
+{bar}
+VM Creation Complete!
+{bar}
+
+VM Name: {vm_name}
+Hostname: {hostname}
+Username: {username}
+Password: {password}
+
+Resources:
+  - RAM: {memory_mb}MB
+  - CPUs: {cpu_count}
+  - Disk: {disk_size_gb}GB
+
+Port Forwarding (Host -> VM):
+{port_forwards}
+
+Installation Mode: {mode_notes}
+
+Autostart:
+  - VM will automatically start on host boot
+  - Autostart delay: 10 seconds
+
+After Installation:
+  - SSH access: ssh -p 2222 {username}@localhost
+  - Web access: http://localhost:8000
+
+Useful Commands:
+  VBoxManage startvm "{vm_name}" --type gui       # Start with display
+  VBoxManage startvm "{vm_name}" --type headless  # Start without display
+  VBoxManage controlvm "{vm_name}" poweroff       # Force shutdown
+  VBoxManage controlvm "{vm_name}" acpipowerbutton # Graceful shutdown
+  VBoxManage showvminfo "{vm_name}"               # Show VM info
+  VBoxManage unregistervm "{vm_name}" --delete    # Delete VM
+{bar}"""
+
+UNATTENDED_NOTES = """Unattended (automatic)
+  - The VM will install Ubuntu automatically
+  - This may take 15-30 minutes
+  - The VM will reboot when complete"""
+
+MANUAL_NOTES = """Manual
+  - Follow the Ubuntu installer prompts
+  - Remember to eject the ISO after installation"""
+
 def print_summary(vm_name, username, password, hostname, memory_mb, cpu_count, disk_size_gb, unattended):
     """Print installation summary"""
-    print("\n" + "="*50)
-    print("VM Creation Complete!")
-    print("="*50)
-
-    print(f"\nVM Name: {vm_name}")
-    print(f"Hostname: {hostname}")
-    print(f"Username: {username}")
-    print(f"Password: {password}")
-
-    print(f"\nResources:")
-    print(f"  - RAM: {memory_mb}MB")
-    print(f"  - CPUs: {cpu_count}")
-    print(f"  - Disk: {disk_size_gb}GB")
-
-    print(f"\nPort Forwarding (Host -> VM):")
-    print(f"  - SSH:        localhost:2222  -> VM:22")
-    print(f"  - HTTP:       localhost:8000  -> VM:80")
-    print(f"  - HTTPS:      localhost:8443  -> VM:443")
-    print(f"  - phpMyAdmin: localhost:8080  -> VM:8080")
-
-    if unattended:
-        print(f"\nInstallation Mode: Unattended (automatic)")
-        print(f"  - The VM will install Ubuntu automatically")
-        print(f"  - This may take 15-30 minutes")
-        print(f"  - The VM will reboot when complete")
-    else:
-        print(f"\nInstallation Mode: Manual")
-        print(f"  - Follow the Ubuntu installer prompts")
-        print(f"  - Remember to eject the ISO after installation")
-
-    print(f"\nAutostart:")
-    print(f"  - VM will automatically start on host boot")
-    print(f"  - Autostart delay: 10 seconds")
-
-    print(f"\nAfter Installation:")
-    print(f"  - SSH access: ssh -p 2222 {username}@localhost")
-    print(f"  - Web access: http://localhost:8000")
-
-    print(f"\nUseful Commands:")
-    print(f'  VBoxManage startvm "{vm_name}" --type gui       # Start with display')
-    print(f'  VBoxManage startvm "{vm_name}" --type headless  # Start without display')
-    print(f'  VBoxManage controlvm "{vm_name}" poweroff       # Force shutdown')
-    print(f'  VBoxManage controlvm "{vm_name}" acpipowerbutton # Graceful shutdown')
-    print(f'  VBoxManage showvminfo "{vm_name}"               # Show VM info')
-    print(f'  VBoxManage unregistervm "{vm_name}" --delete    # Delete VM')
-
-    print("="*50)
+    port_forwards = "\n".join(
+        f"  - {name + ':':<12} localhost:{host_port:<5} -> VM:{guest_port}"
+        for name, host_port, guest_port in PORT_FORWARDS
+    )
+    print(SUMMARY_TEMPLATE.format(
+        bar="=" * 50,
+        vm_name=vm_name,
+        hostname=hostname,
+        username=username,
+        password=password,
+        memory_mb=memory_mb,
+        cpu_count=cpu_count,
+        disk_size_gb=disk_size_gb,
+        port_forwards=port_forwards,
+        mode_notes=UNATTENDED_NOTES if unattended else MANUAL_NOTES,
+    ))
 
 def main():
     parser = argparse.ArgumentParser(description='Create Ubuntu 24.04 VM in VirtualBox')
@@ -269,6 +425,8 @@ def main():
                       help='Do not start VM after creation')
     parser.add_argument('--manual-install', action='store_true',
                       help='Skip unattended installation setup')
+    parser.add_argument('--force-check', action='store_true',
+                      help='Re-run environment checks, ignoring cached results')
 
     args = parser.parse_args()
 
@@ -278,7 +436,7 @@ def main():
     print()
 
     # Check VirtualBox
-    check_vboxmanage()
+    check_vboxmanage(force=args.force_check)
 
     # Check ISO
     iso_path = os.path.abspath(args.iso_path)
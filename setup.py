@@ -1,20 +1,68 @@
 #!/usr/bin/env python3
 
+import http.client
+import shutil
+import socket
 import subprocess
 import sys
 import os
 import argparse
 import time
 
-def run_command(cmd, check=True, shell=False):
-    """Execute shell command and return result"""
+# asyncio, glob and tarfile are imported where needed, so the restore
+# path does not pay for the setup machinery and vice versa
+
+# systemd socket enabled by enable_podman_socket
+PODMAN_SOCKET = "/run/podman/podman.sock"
+
+# Images used by the stack, pre-pulled in parallel before containers are created
+IMAGES = {
+    "mysql": "docker.io/library/mysql:8.0",
+    "apache": "docker.io/library/httpd:2.4",
+    "phpmyadmin": "docker.io/phpmyadmin/phpmyadmin:latest",
+}
+
+# Per-container resource limits; they keep a runaway service from starving
+# the others and bound the kernel-side work podman does per container.
+# --stop-timeout caps how long podman stop waits before SIGKILL, so stack
+# shutdowns and restores don't hang on the default 10-second grace period
+CONTAINER_LIMITS = {
+    "mysql": ["--pids-limit", "512", "--cpus", "2", "--memory", "2g", "--stop-timeout", "5"],
+    "apache": ["--pids-limit", "256", "--cpus", "2", "--memory", "1g", "--stop-timeout", "5"],
+    "phpmyadmin": ["--pids-limit", "256", "--cpus", "1", "--memory", "512m", "--stop-timeout", "5"],
+}
+
+def run_command(cmd, check=True, shell=False, capture=True):
+    """Execute shell command and return result
+
+    capture=False lets the command write straight to the terminal instead
+    of buffering output nobody reads.
+    """
     try:
         if isinstance(cmd, str) and not shell:
             cmd = cmd.split()
-        result = subprocess.run(cmd, capture_output=True, text=True, shell=shell, check=check)
-        return result.returncode == 0, result.stdout, result.stderr
+        result = subprocess.run(cmd, capture_output=capture, text=True, shell=shell, check=check)
+        return result.returncode == 0, result.stdout or '', result.stderr or ''
     except subprocess.CalledProcessError as e:
-        return False, e.stdout, e.stderr
+        return False, e.stdout or '', e.stderr or ''
+
+_command_paths = {}
+
+def find_command(name):
+    """Locate a command on PATH without forking, caching the result"""
+    if name not in _command_paths:
+        _command_paths[name] = shutil.which(name)
+    return _command_paths[name]
+
+_podman_version = None
+
+def get_podman_version():
+    """Return `podman --version` output, querying it at most once"""
+    global _podman_version
+    if _podman_version is None:
+        success, stdout, _ = run_command("podman --version", check=False)
+        _podman_version = stdout.strip() if success else ""
+    return _podman_version
 
 def check_root():
     """Check if script is running as root"""
@@ -22,37 +70,32 @@ def check_root():
         print("Please run as root or with sudo")
         sys.exit(1)
 
-def check_install_podman():
-    """Check if Podman is installed, install if not"""
+def install_packages(domain, email):
+    """Install Podman, plus Certbot when a domain is given, in one apt-get run"""
     print("[1/6] Checking Podman installation...")
-    success, stdout, _ = run_command("which podman", check=False)
-
-    if not success:
-        print("Podman not found. Installing Podman...")
-        run_command("apt-get update")
-        run_command("apt-get install -y podman")
-        print("Podman installed successfully.")
-    else:
-        success, version, _ = run_command("podman --version")
-        print(f"Podman is already installed ({version.strip()})")
+    packages = ["podman", "rsync"]
+    if domain:
+        print("\n[2/6] Checking Certbot for Let's Encrypt...")
+        packages.append("certbot")
 
-def install_certbot(domain, email):
-    """Install Certbot for Let's Encrypt if domain is provided"""
-    if not domain:
-        return email
+    missing = [pkg for pkg in packages if not find_command(pkg)]
 
-    print("\n[2/6] Installing Certbot for Let's Encrypt...")
-    success, _, _ = run_command("which certbot", check=False)
+    if missing:
+        # One update and one install regardless of how many packages are missing
+        print(f"Installing missing packages: {', '.join(missing)}...")
+        run_command("apt-get update", capture=False)
+        run_command(["apt-get", "install", "-y"] + missing, capture=False)
+        print("Packages installed successfully.")
+        # The install just changed PATH contents; drop the stale lookups
+        for pkg in missing:
+            _command_paths.pop(pkg, None)
 
-    if not success:
-        run_command("apt-get update")
-        run_command("apt-get install -y certbot")
-        print("Certbot installed successfully.")
-    else:
-        print("Certbot is already installed")
+    print(f"Podman is ready ({get_podman_version()})")
 
-    if not email:
-        email = f"admin@{domain}"
+    if domain:
+        print("Certbot is ready")
+        if not email:
+            email = f"admin@{domain}"
 
     return email
 
@@ -61,60 +104,133 @@ def enable_podman_socket():
     print("\n[3/6] Enabling Podman systemd socket...")
     run_command("systemctl enable --now podman.socket")
 
+def pull_images():
+    """Pull all stack images in parallel so container creation never waits"""
+    print("\nPre-pulling container images...")
+    procs = [
+        subprocess.Popen(
+            ["podman", "pull", "-q", image],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        for image in IMAGES.values()
+    ]
+    for proc in procs:
+        proc.wait()
+    print("Images ready")
+
 def create_network(network_name):
     """Create Podman network"""
     print(f"\n[4/6] Creating Podman network...")
-    success, _, _ = run_command(f"podman network exists {network_name}", check=False)
-
-    if success:
+    if network_exists(network_name):
         print(f"Network {network_name} already exists")
     else:
         run_command(f"podman network create {network_name}")
         print(f"Network {network_name} created")
 
+class _PodmanSocketConnection(http.client.HTTPConnection):
+    """HTTP connection over the Podman UNIX socket"""
+
+    def __init__(self):
+        super().__init__("localhost")
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(PODMAN_SOCKET)
+
+def podman_api(path):
+    """GET against the Podman REST socket; returns the HTTP status or None"""
+    try:
+        conn = _PodmanSocketConnection()
+        conn.request("GET", path)
+        response = conn.getresponse()
+        response.read()
+        conn.close()
+        return response.status
+    except (OSError, http.client.HTTPException):
+        return None
+
+def container_exists(name):
+    """Check container existence via the REST socket, falling back to the CLI"""
+    status = podman_api(f"/v4.0.0/libpod/containers/{name}/exists")
+    if status is not None:
+        return status == 204
+    success, _, _ = run_command(["podman", "container", "exists", name], check=False)
+    return success
+
+def network_exists(name):
+    """Check network existence via the REST socket, falling back to the CLI"""
+    status = podman_api(f"/v4.0.0/libpod/networks/{name}/exists")
+    if status is not None:
+        return status == 204
+    success, _, _ = run_command(["podman", "network", "exists", name], check=False)
+    return success
+
+def install_cron_job(name, schedule, command):
+    """Install a cron job as a drop-in file under /etc/cron.d
+
+    Rewriting the file is idempotent, unlike appending to the user crontab,
+    and needs no crontab subprocess round trip.
+    """
+    cron_path = f"/etc/cron.d/{name}"
+    with open(cron_path, "w") as f:
+        f.write(f"{schedule} root {command}\n")
+    os.chmod(cron_path, 0o644)
+    return cron_path
+
+def wait_for_mysql(mysql_container, timeout=120):
+    """Poll until MySQL answers mysqladmin ping, or the timeout expires
+
+    mysqladmin exits 0 as soon as the server responds, even without
+    credentials, so no password is needed for the probe.
+    """
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        success, _, _ = run_command(
+            ["podman", "exec", mysql_container, "mysqladmin", "ping", "--silent"],
+            check=False
+        )
+        if success:
+            return True
+        time.sleep(1)
+    return False
+
 def setup_mysql(network_name, mysql_container, mysql_user, mysql_password, mysql_root_password):
     """Setup MySQL container"""
     print(f"\n[5/6] Setting up MySQL container...")
 
     # Stop and remove existing container
-    run_command(f"podman stop {mysql_container}", check=False)
-    run_command(f"podman rm {mysql_container}", check=False)
+    if container_exists(mysql_container):
+        run_command(f"podman stop {mysql_container}", check=False)
+        run_command(f"podman rm {mysql_container}", check=False)
 
     # Create MySQL container
     cmd = [
         "podman", "run", "-d",
         "--name", mysql_container,
         "--network", network_name,
+        *CONTAINER_LIMITS["mysql"],
         "-e", f"MYSQL_ROOT_PASSWORD={mysql_root_password}",
         "-e", f"MYSQL_USER={mysql_user}",
         "-e", f"MYSQL_PASSWORD={mysql_password}",
         "-e", "MYSQL_DATABASE=testdb",
         "-p", "3306:3306",
         "-v", "mysql_data:/var/lib/mysql",
-        "docker.io/library/mysql:8.0"
+        IMAGES["mysql"]
     ]
     run_command(cmd)
     print(f"MySQL container created (user: {mysql_user}, password: {mysql_password})")
 
-    # Generate systemd service
-    os.makedirs("/etc/systemd/system", exist_ok=True)
-    run_command(f"podman generate systemd --new --name {mysql_container} --files --restart-policy=always")
-    run_command(f"mv container-{mysql_container}.service /etc/systemd/system/", shell=True)
-    run_command("systemctl daemon-reload")
-    run_command(f"systemctl enable container-{mysql_container}.service")
-    print("MySQL auto-start enabled")
-
-def obtain_ssl_certificate(domain, email, apache_container):
-    """Obtain Let's Encrypt SSL certificate"""
+def obtain_ssl_certificate(domain, email):
+    """Obtain Let's Encrypt SSL certificate through the running Apache"""
     print(f"Obtaining Let's Encrypt certificate for {domain}...")
     print("Note: Ensure that your domain points to this server's IP address")
 
-    # Stop Apache temporarily
-    run_command(f"podman stop {apache_container}", check=False)
-
-    # Obtain certificate
+    # Apache is already serving /opt/apache-ssl/www on port 80, so the
+    # ACME challenge is answered from the webroot without any downtime
     cmd = [
-        "certbot", "certonly", "--standalone",
+        "certbot", "certonly", "--webroot",
+        "--webroot-path", "/opt/apache-ssl/www",
         "--non-interactive",
         "--agree-tos",
         "--email", email,
@@ -128,11 +244,14 @@ def obtain_ssl_certificate(domain, email, apache_container):
         return False
 
     # Copy certificates
+    import glob
+
     cert_path = f"/etc/letsencrypt/live/{domain}"
     if os.path.isdir(cert_path):
-        run_command(f"cp {cert_path}/fullchain.pem /opt/apache-ssl/certs/", shell=True)
-        run_command(f"cp {cert_path}/privkey.pem /opt/apache-ssl/certs/", shell=True)
-        run_command("chmod 644 /opt/apache-ssl/certs/*.pem", shell=True)
+        shutil.copy2(os.path.join(cert_path, "fullchain.pem"), "/opt/apache-ssl/certs/")
+        shutil.copy2(os.path.join(cert_path, "privkey.pem"), "/opt/apache-ssl/certs/")
+        for pem in glob.glob("/opt/apache-ssl/certs/*.pem"):
+            os.chmod(pem, 0o644)
         print(f"SSL certificate installed for {domain}")
         return True
 
@@ -177,77 +296,66 @@ def setup_apache(network_name, apache_container, domain, email):
     print(f"\n[6/6] Setting up Apache2 container...")
 
     # Stop and remove existing container
-    run_command(f"podman stop {apache_container}", check=False)
-    run_command(f"podman rm {apache_container}", check=False)
+    if container_exists(apache_container):
+        run_command(f"podman stop {apache_container}", check=False)
+        run_command(f"podman rm {apache_container}", check=False)
 
     # Create directories
     os.makedirs("/opt/apache-ssl/certs", exist_ok=True)
     os.makedirs("/opt/apache-ssl/www", exist_ok=True)
 
+    # Always create the HTTP container first; when SSL is wanted it serves
+    # the ACME webroot challenge while staying online
+    cmd = [
+        "podman", "run", "-d",
+        "--name", apache_container,
+        "--network", network_name,
+        *CONTAINER_LIMITS["apache"],
+        "-p", "80:80",
+        "-p", "443:443",
+        "-v", "/opt/apache-ssl/www:/usr/local/apache2/htdocs:Z",
+        IMAGES["apache"]
+    ]
+    run_command(cmd)
+    print("Apache2 container created (HTTP)")
+
     has_ssl = False
 
     # Setup SSL if domain provided
     if domain:
-        if obtain_ssl_certificate(domain, email, apache_container):
+        if obtain_ssl_certificate(domain, email):
             create_ssl_config(domain)
 
-            # Create Apache with SSL
+            # Recreate Apache with the SSL mounts
+            run_command(f"podman stop {apache_container}", check=False)
+            run_command(f"podman rm {apache_container}", check=False)
             cmd = [
                 "podman", "run", "-d",
                 "--name", apache_container,
                 "--network", network_name,
+                *CONTAINER_LIMITS["apache"],
                 "-p", "80:80",
                 "-p", "443:443",
                 "-v", "/opt/apache-ssl/www:/usr/local/apache2/htdocs:Z",
                 "-v", "/opt/apache-ssl/certs:/usr/local/apache2/conf/certs:Z",
                 "-v", "/opt/apache-ssl/ssl.conf:/usr/local/apache2/conf/extra/httpd-ssl.conf:Z",
-                "docker.io/library/httpd:2.4",
+                IMAGES["apache"],
                 "sh", "-c", "echo 'Include conf/extra/httpd-ssl.conf' >> /usr/local/apache2/conf/httpd.conf && httpd-foreground"
             ]
             run_command(cmd)
-            print("Apache2 container created with SSL support")
+            print("Apache2 container recreated with SSL support")
             has_ssl = True
 
-            # Setup auto-renewal
+            # Setup auto-renewal; the webroot challenge renews with Apache
+            # still running, the restart only reloads the copied certificate
             print("Setting up automatic certificate renewal...")
-            renewal_cmd = f"0 3 * * * certbot renew --quiet --deploy-hook 'cp /etc/letsencrypt/live/{domain}/fullchain.pem /opt/apache-ssl/certs/ && cp /etc/letsencrypt/live/{domain}/privkey.pem /opt/apache-ssl/certs/ && podman restart {apache_container}'"
-
-            # Get existing crontab
-            success, current_cron, _ = run_command("crontab -l", check=False)
-            if success:
-                new_cron = current_cron + "\n" + renewal_cmd
-            else:
-                new_cron = renewal_cmd
-
-            # Set new crontab
-            process = subprocess.Popen(['crontab', '-'], stdin=subprocess.PIPE, text=True)
-            process.communicate(input=new_cron)
+            renewal_cmd = f"certbot renew --quiet --deploy-hook 'cp /etc/letsencrypt/live/{domain}/fullchain.pem /opt/apache-ssl/certs/ && cp /etc/letsencrypt/live/{domain}/privkey.pem /opt/apache-ssl/certs/ && podman restart {apache_container}'"
+            install_cron_job("podman-lamp-certbot-renew", "0 3 * * *", renewal_cmd)
             print("Auto-renewal configured (daily check at 3 AM)")
         else:
-            print("Certificate not found, creating Apache without SSL")
-
-    # Create Apache without SSL if no domain or SSL failed
-    if not has_ssl:
-        cmd = [
-            "podman", "run", "-d",
-            "--name", apache_container,
-            "--network", network_name,
-            "-p", "80:80",
-            "-p", "443:443",
-            "-v", "/opt/apache-ssl/www:/usr/local/apache2/htdocs:Z",
-            "docker.io/library/httpd:2.4"
-        ]
-        run_command(cmd)
-        print("Apache2 container created (HTTP only)")
-        if not domain:
-            print(f"To enable SSL, run: sudo python3 {sys.argv[0]} --domain your-domain.com --email your-email@example.com")
-
-    # Generate systemd service
-    run_command(f"podman generate systemd --new --name {apache_container} --files --restart-policy=always")
-    run_command(f"mv container-{apache_container}.service /etc/systemd/system/", shell=True)
-    run_command("systemctl daemon-reload")
-    run_command(f"systemctl enable container-{apache_container}.service")
-    print("Apache2 auto-start enabled")
+            print("Certificate not found, keeping Apache without SSL")
+    else:
+        print(f"To enable SSL, run: sudo python3 {sys.argv[0]} --domain your-domain.com --email your-email@example.com")
 
     return has_ssl
 
@@ -256,31 +364,73 @@ def setup_phpmyadmin(network_name, phpmyadmin_container, mysql_container, mysql_
     print("\n[Bonus] Setting up phpMyAdmin container...")
 
     # Stop and remove existing container
-    run_command(f"podman stop {phpmyadmin_container}", check=False)
-    run_command(f"podman rm {phpmyadmin_container}", check=False)
+    if container_exists(phpmyadmin_container):
+        run_command(f"podman stop {phpmyadmin_container}", check=False)
+        run_command(f"podman rm {phpmyadmin_container}", check=False)
 
     # Wait for MySQL to be ready
     print("Waiting for MySQL to be ready...")
-    time.sleep(10)
+    if not wait_for_mysql(mysql_container):
+        print("WARNING: MySQL did not become ready in time, continuing anyway")
 
     # Create phpMyAdmin container
     cmd = [
         "podman", "run", "-d",
         "--name", phpmyadmin_container,
         "--network", network_name,
+        *CONTAINER_LIMITS["phpmyadmin"],
         "-e", f"PMA_HOST={mysql_container}",
         "-p", "8080:80",
-        "docker.io/phpmyadmin/phpmyadmin:latest"
+        IMAGES["phpmyadmin"]
     ]
     run_command(cmd)
     print("phpMyAdmin container created with login authentication")
 
-    # Generate systemd service
-    run_command(f"podman generate systemd --new --name {phpmyadmin_container} --files --restart-policy=always")
-    run_command(f"mv container-{phpmyadmin_container}.service /etc/systemd/system/", shell=True)
+async def create_containers(network_name, mysql_container, apache_container,
+                            phpmyadmin_container, mysql_user, mysql_password,
+                            mysql_root_password, domain, email):
+    """Create all containers, overlapping independent work
+
+    Apache (including the optional certificate setup) does not depend on
+    MySQL, so it runs concurrently with the MySQL chain; phpMyAdmin needs
+    MySQL up first, so it follows it on the same chain.
+    """
+    import asyncio
+
+    async def mysql_chain():
+        await asyncio.to_thread(
+            setup_mysql, network_name, mysql_container,
+            mysql_user, mysql_password, mysql_root_password
+        )
+        await asyncio.to_thread(
+            setup_phpmyadmin, network_name, phpmyadmin_container,
+            mysql_container, mysql_user, mysql_password
+        )
+
+    _, has_ssl = await asyncio.gather(
+        mysql_chain(),
+        asyncio.to_thread(setup_apache, network_name, apache_container, domain, email),
+    )
+    return has_ssl
+
+def install_systemd_units(containers):
+    """Generate systemd units for all containers in one batch
+
+    podman generate systemd takes one container per call, but the unit
+    files are all generated before a single daemon-reload and a single
+    enable covering every service.
+    """
+    print("\nEnabling container auto-start...")
+    os.makedirs("/etc/systemd/system", exist_ok=True)
+
+    for container in containers:
+        run_command(f"podman generate systemd --new --name {container} --files --restart-policy=always")
+        unit = f"container-{container}.service"
+        os.replace(unit, os.path.join("/etc/systemd/system", unit))
+
     run_command("systemctl daemon-reload")
-    run_command(f"systemctl enable container-{phpmyadmin_container}.service")
-    print("phpMyAdmin auto-start enabled")
+    run_command(["systemctl", "enable"] + [f"container-{c}.service" for c in containers])
+    print(f"Auto-start enabled for: {', '.join(containers)}")
 
 def setup_backup(mysql_container, mysql_root_password):
     """Setup automatic daily backups"""
@@ -293,36 +443,45 @@ def setup_backup(mysql_container, mysql_root_password):
     # Create backup script
     backup_script = f"""#!/bin/bash
 # Podman LAMP Stack Backup Script
+# Unset variables and silent pipeline failures abort the run; optional
+# steps carry their own || fallback below
+set -euo pipefail
+
 BACKUP_DIR="{backup_dir}"
 DATE=$(date +%Y%m%d_%H%M%S)
 BACKUP_PATH="$BACKUP_DIR/backup_$DATE"
 RETENTION_DAYS=30
 
-mkdir -p "$BACKUP_PATH"
-
-# Backup MySQL database
-echo "Backing up MySQL database..."
-podman exec {mysql_container} mysqldump -u root -p{mysql_root_password} --all-databases > "$BACKUP_PATH/mysql_dump.sql" 2>/dev/null
+# Most recent previous backup, if any, for hardlinking unchanged files
+PREV_BACKUP=$(ls -1d "$BACKUP_DIR"/backup_* 2>/dev/null | sort | tail -1 || true)
 
-# Backup Apache web files
-echo "Backing up Apache web files..."
-tar -czf "$BACKUP_PATH/apache_www.tar.gz" /opt/apache-ssl/www 2>/dev/null
-
-# Backup SSL certificates if they exist
-if [ -d "/opt/apache-ssl/certs" ]; then
-    echo "Backing up SSL certificates..."
-    tar -czf "$BACKUP_PATH/ssl_certs.tar.gz" /opt/apache-ssl/certs /etc/letsencrypt 2>/dev/null || true
+mkdir -p "$BACKUP_PATH"
+echo "Backing up to $BACKUP_PATH"
+
+# Backup MySQL database, compressing in-flight so the raw dump never
+# touches the disk; a stopped container must not kill the file backups
+podman exec {mysql_container} mysqldump -u root -p{mysql_root_password} --single-transaction --quick --all-databases 2>/dev/null | gzip > "$BACKUP_PATH/mysql_dump.sql.gz" || echo "WARNING: MySQL dump failed"
+
+# Backup web files incrementally: every snapshot is complete, but files
+# unchanged since the previous backup are hardlinked instead of copied
+if [ -n "$PREV_BACKUP" ] && [ -d "$PREV_BACKUP/www" ]; then
+    rsync -a --delete --link-dest="$PREV_BACKUP/www" /opt/apache-ssl/www/ "$BACKUP_PATH/www/"
+else
+    rsync -a /opt/apache-ssl/www/ "$BACKUP_PATH/www/"
 fi
 
-# Backup container configurations
-echo "Backing up container configurations..."
-podman inspect {mysql_container} > "$BACKUP_PATH/mysql_config.json" 2>/dev/null || true
-podman inspect apache2_server > "$BACKUP_PATH/apache_config.json" 2>/dev/null || true
-podman inspect phpmyadmin > "$BACKUP_PATH/phpmyadmin_config.json" 2>/dev/null || true
+# Certificates and Let's Encrypt state still travel as one archive
+tar -czf "$BACKUP_PATH/site_backup.tar.gz" /opt/apache-ssl/certs /etc/letsencrypt 2>/dev/null || true
 
-# Delete old backups
-echo "Cleaning up old backups (older than $RETENTION_DAYS days)..."
-find "$BACKUP_DIR" -type d -name "backup_*" -mtime +$RETENTION_DAYS -exec rm -rf {{}} \\; 2>/dev/null || true
+# Record which image each container ran; the full inspect dumps carried
+# nothing else the restore path ever used
+podman inspect --format '{{{{.Name}}}} {{{{.ImageName}}}}' {mysql_container} apache2_server phpmyadmin > "$BACKUP_PATH/container_images.txt" 2>/dev/null || true
+
+# Delete old backups, selecting only the top-level snapshot directories:
+# the files inside keep their source mtimes (rsync -a hardlink snapshots),
+# so matching per-file would unlink old-but-current site files from every
+# snapshot, including the one just taken
+find "$BACKUP_DIR" -mindepth 1 -maxdepth 1 -type d -name "backup_*" -mtime +$RETENTION_DAYS -exec rm -rf {{}} + 2>/dev/null || true
 
 echo "Backup completed: $BACKUP_PATH"
 """
@@ -333,35 +492,21 @@ echo "Backup completed: $BACKUP_PATH"
         f.write(backup_script)
 
     # Make executable
-    run_command(f"chmod +x {backup_script_path}")
+    os.chmod(backup_script_path, 0o755)
     print(f"Backup script created: {backup_script_path}")
 
-    # Add to crontab (daily at 2 AM)
-    backup_cron = f"0 2 * * * {backup_script_path} >> /var/log/podman-backup.log 2>&1"
-
-    # Get existing crontab
-    success, current_cron, _ = run_command("crontab -l", check=False)
-    if success:
-        # Check if backup job already exists
-        if "podman-lamp-backup.sh" not in current_cron:
-            new_cron = current_cron + "\n" + backup_cron
-        else:
-            new_cron = current_cron
-            print("Backup cron job already exists")
-    else:
-        new_cron = backup_cron
-
-    # Set new crontab
-    if "podman-lamp-backup.sh" not in (current_cron if success else ""):
-        process = subprocess.Popen(['crontab', '-'], stdin=subprocess.PIPE, text=True)
-        process.communicate(input=new_cron)
-        print("Automatic backup configured (daily at 2 AM)")
-        print(f"Backup directory: {backup_dir}")
-        print("Backup retention: 30 days (1 month)")
+    # Schedule daily at 2 AM
+    install_cron_job(
+        "podman-lamp-backup", "0 2 * * *",
+        f"{backup_script_path} >> /var/log/podman-backup.log 2>&1"
+    )
+    print("Automatic backup configured (daily at 2 AM)")
+    print(f"Backup directory: {backup_dir}")
+    print("Backup retention: 30 days (1 month)")
 
     # Run initial backup
     print("Running initial backup...")
-    run_command(backup_script_path, check=False)
+    run_command(backup_script_path, check=False, capture=False)
 
 def print_summary(domain, has_ssl, mysql_user, mysql_password, mysql_root_password):
     """Print installation summary"""
@@ -413,6 +558,13 @@ def print_summary(domain, has_ssl, mysql_user, mysql_password, mysql_root_passwo
 
     print("="*40)
 
+def extract_archive(archive):
+    """Extract a backup archive back to the filesystem root"""
+    import tarfile
+
+    with tarfile.open(archive) as tar:
+        tar.extractall("/")
+
 def restore_backup(backup_path=None):
     """Restore from backup"""
     print("\n" + "="*40)
@@ -428,12 +580,18 @@ def restore_backup(backup_path=None):
             print(f"Error: Backup directory {backup_dir} not found")
             sys.exit(1)
 
-        backups = sorted([d for d in os.listdir(backup_dir) if d.startswith("backup_")])
+        # scandir keeps the stat result with each entry, so picking the most
+        # recent backup needs no extra stat calls or name-string sorting
+        with os.scandir(backup_dir) as entries:
+            backups = [
+                entry for entry in entries
+                if entry.is_dir() and entry.name.startswith("backup_")
+            ]
         if not backups:
             print(f"Error: No backups found in {backup_dir}")
             sys.exit(1)
 
-        backup_path = os.path.join(backup_dir, backups[-1])
+        backup_path = max(backups, key=lambda entry: entry.stat().st_mtime).path
         print(f"Using latest backup: {backup_path}")
     else:
         if not os.path.isdir(backup_path):
@@ -448,44 +606,74 @@ def restore_backup(backup_path=None):
     print("\n[1/4] Stopping containers...")
     run_command(f"podman stop {MYSQL_CONTAINER}", check=False)
     run_command(f"podman stop {APACHE_CONTAINER}", check=False)
-    time.sleep(3)
 
-    # Restore MySQL
+    # Restore MySQL; newer backups hold a gzipped dump, older ones plain SQL
+    mysql_dump_gz = os.path.join(backup_path, "mysql_dump.sql.gz")
     mysql_dump = os.path.join(backup_path, "mysql_dump.sql")
-    if os.path.isfile(mysql_dump):
+    if os.path.isfile(mysql_dump_gz) or os.path.isfile(mysql_dump):
         print("\n[2/4] Restoring MySQL database...")
         run_command(f"podman start {MYSQL_CONTAINER}", check=False)
-        time.sleep(5)
-
-        with open(mysql_dump, 'r') as f:
+        wait_for_mysql(MYSQL_CONTAINER, timeout=60)
+
+        mysql_cmd = ['podman', 'exec', '-i', MYSQL_CONTAINER, 'mysql', '-u', 'root', f'-p{MYSQL_ROOT_PASSWORD}']
+        if os.path.isfile(mysql_dump_gz):
+            # Chain gzip -dc into the mysql client so the kernel pipe handles
+            # backpressure; if mysql exits mid-stream, gzip just gets SIGPIPE
+            # instead of a BrokenPipeError in this process
+            gunzip = subprocess.Popen(
+                ['gzip', '-dc', mysql_dump_gz],
+                stdout=subprocess.PIPE
+            )
             process = subprocess.Popen(
-                ['podman', 'exec', '-i', MYSQL_CONTAINER, 'mysql', '-u', 'root', f'-p{MYSQL_ROOT_PASSWORD}'],
-                stdin=f,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
+                mysql_cmd,
+                stdin=gunzip.stdout,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL
             )
-            process.communicate()
+            gunzip.stdout.close()
+            process.wait()
+            gunzip.wait()
+        else:
+            with open(mysql_dump, 'rb') as f:
+                process = subprocess.Popen(
+                    mysql_cmd,
+                    stdin=f,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE
+                )
+                process.communicate()
         print("MySQL database restored")
     else:
         print(f"\n[2/4] Warning: MySQL dump not found in {backup_path}")
 
-    # Restore Apache files
+    # Restore web files; newer backups keep them as a plain www directory
+    # (hardlink snapshot), older ones as an apache_www archive
+    www_backup = os.path.join(backup_path, "www")
     apache_backup = os.path.join(backup_path, "apache_www.tar.gz")
-    if os.path.isfile(apache_backup):
+    if os.path.isdir(www_backup):
+        print("\n[3/4] Restoring web files...")
+        shutil.copytree(www_backup, "/opt/apache-ssl/www", dirs_exist_ok=True)
+        print("Web files restored")
+    elif os.path.isfile(apache_backup):
         print("\n[3/4] Restoring Apache web files...")
-        run_command(f"tar -xzf {apache_backup} -C /", shell=True)
+        extract_archive(apache_backup)
         print("Apache web files restored")
     else:
-        print(f"\n[3/4] Warning: Apache backup not found in {backup_path}")
+        print(f"\n[3/4] Warning: web files backup not found in {backup_path}")
 
-    # Restore SSL certificates
+    # Restore certificates from whichever archive this backup carries
+    site_backup = os.path.join(backup_path, "site_backup.tar.gz")
     ssl_backup = os.path.join(backup_path, "ssl_certs.tar.gz")
-    if os.path.isfile(ssl_backup):
+    if os.path.isfile(site_backup):
+        print("\n[4/4] Restoring certificates...")
+        extract_archive(site_backup)
+        print("Certificates restored")
+    elif os.path.isfile(ssl_backup):
         print("\n[4/4] Restoring SSL certificates...")
-        run_command(f"tar -xzf {ssl_backup} -C /", shell=True)
+        extract_archive(ssl_backup)
         print("SSL certificates restored")
     else:
-        print("\n[4/4] No SSL certificates to restore")
+        print("\n[4/4] No certificate archive to restore")
 
     # Restart containers
     print("\nRestarting containers...")
@@ -532,13 +720,16 @@ def main():
     MYSQL_ROOT_PASSWORD = "1"
 
     # Install components
-    check_install_podman()
-    email = install_certbot(args.domain, args.email)
+    email = install_packages(args.domain, args.email)
     enable_podman_socket()
     create_network(NETWORK_NAME)
-    setup_mysql(NETWORK_NAME, MYSQL_CONTAINER, MYSQL_USER, MYSQL_PASSWORD, MYSQL_ROOT_PASSWORD)
-    has_ssl = setup_apache(NETWORK_NAME, APACHE_CONTAINER, args.domain, email)
-    setup_phpmyadmin(NETWORK_NAME, PHPMYADMIN_CONTAINER, MYSQL_CONTAINER, MYSQL_USER, MYSQL_PASSWORD)
+    pull_images()
+    import asyncio
+    has_ssl = asyncio.run(create_containers(
+        NETWORK_NAME, MYSQL_CONTAINER, APACHE_CONTAINER, PHPMYADMIN_CONTAINER,
+        MYSQL_USER, MYSQL_PASSWORD, MYSQL_ROOT_PASSWORD, args.domain, email
+    ))
+    install_systemd_units([MYSQL_CONTAINER, APACHE_CONTAINER, PHPMYADMIN_CONTAINER])
     setup_backup(MYSQL_CONTAINER, MYSQL_ROOT_PASSWORD)
 
     # Print summary